@@ -9,11 +9,13 @@ import argparse
 import logging
 import os
 import subprocess
+from typing import Optional
 
 import didppy as dp
 import termcolor as tc
 
 from pddl2dypdl.sas2dypdl import Sas2DypdlTransformer
+from pddl2dypdl.util.cache import cache_enabled, load_cache, save_cache
 from pddl2dypdl.util.logging import init_logger
 from pddl2dypdl.util.managers import TimerContextManager
 
@@ -27,6 +29,10 @@ python3 -m pddl2dypdl ext/blocks/domain.pddl ext/blocks/problem.pddl
 
 # Plan with SAS+ input
 python3 -m pddl2dypdl ext/blocks/problem.sas
+
+# Reuse parsed SAS+ files from ~/.cache/pddl2dypdl between runs; this only skips SAS+ parsing, the PDDL translator
+# still runs every time and usually dominates the runtime
+PDDL2DYPDL_CACHE=1 python3 -m pddl2dypdl ext/blocks/domain.pddl ext/blocks/problem.pddl
 """
 
 
@@ -34,7 +40,23 @@ PATH_TO_TRANSLATE = f"{os.path.dirname(os.path.abspath(__file__))}/../ext/transl
 SOLVERS = ["cabs", "caasdy", "acps", "apps", "lnbs"]
 
 
-def main():
+def existing_path(path: str) -> str:
+    if not os.path.exists(path):
+        raise argparse.ArgumentTypeError(f"{path} does not exist.")
+    return path
+
+
+def write_plan(plan_file: str, plan: bytes) -> None:
+    fd = os.open(plan_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(plan)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+
+
+def main(argv: Optional[list[str]] = None):
     init_logger()
 
     # fmt: off
@@ -43,7 +65,7 @@ def main():
         epilog=_EPILOG,
         formatter_class=argparse.RawTextHelpFormatter,
     )
-    parser.add_argument("input1", type=str,
+    parser.add_argument("input1", type=existing_path,
                         help="Path to the domain PDDL file or SAS+ file.")
     parser.add_argument("input2", type=str, nargs="?", default=None,
                         help="Path to the problem PDDL file or None input1 is SAS+.")
@@ -55,14 +77,14 @@ def main():
                         help="Time limit for the solver in seconds.")
     parser.add_argument("-v", "--validate", action="store_true",
                         help="Validate the output plan with the VAL tool.")
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     # fmt: on
 
     input1 = args.input1
     input2 = args.input2
     if input1.endswith(".sas"):
-        assert os.path.exists(input1), f"SAS+ file {input1} does not exist."
-        sas_content = open(input1, "r").read().strip()
+        with open(input1, "r") as f:
+            sas_content = f.read()
         logging.info(f"Read SAS+ file from {tc.colored(input1, 'blue')}")
 
         if input2 is not None:
@@ -71,17 +93,36 @@ def main():
             logging.warning("Plan validation is not supported for SAS+ input. Switching off.")
             args.validate = False
     else:
-        assert os.path.exists(input1), f"Domain file {input1} does not exist."
-        assert os.path.exists(input2), f"Problem file {input2} does not exist."
+        if input2 is None:
+            parser.error("a problem PDDL file is required when input1 is a domain PDDL file.")
+        # only checked here as input2 is ignored for SAS+ input
+        if not os.path.exists(input2):
+            parser.error(f"argument input2: {input2} does not exist.")
         with TimerContextManager("translating PDDL to SAS+"):
-            output = subprocess.run([PATH_TO_TRANSLATE, input1, input2, "--to-stdout"], capture_output=True, text=True)
-            sas_content = output.stdout.strip()
+            cmd = [PATH_TO_TRANSLATE, input1, input2, "--to-stdout"]
+            output = subprocess.run(cmd, capture_output=True, text=True)
+            if output.returncode != 0:
+                msg = f"Translating PDDL to SAS+ failed with exit code {output.returncode}"
+                if output.stderr.strip():
+                    msg += f":\n{output.stderr.strip()}"
+                raise RuntimeError(msg)
+            sas_content = output.stdout
         logging.info(f"Read domain PDDL from {tc.colored(input1, 'blue')}")
         logging.info(f"Read problem PDDL from {tc.colored(input2, 'blue')}")
     logging.info(f"Timeout: {args.timeout}s")
 
     with TimerContextManager("translating SAS+ to DIDP"):
-        transformer = Sas2DypdlTransformer(sas_content)
+        # an empty SAS+ input has nothing worth caching
+        use_cache = cache_enabled() and len(sas_content) > 0
+        fingerprint = Sas2DypdlTransformer.PARSER_FINGERPRINT
+        ir = load_cache(sas_content, fingerprint) if use_cache else None
+        if isinstance(ir, dict):
+            logging.info("Loaded parsed SAS+ from cache")
+            transformer = Sas2DypdlTransformer.from_parsed_ir(ir)
+        else:
+            transformer = Sas2DypdlTransformer(sas_content)
+            if use_cache:
+                save_cache(sas_content, fingerprint, transformer.parsed_ir)
         model = transformer.transform()
 
     with TimerContextManager("solving DIDP problem", end=False) as timer:
@@ -123,10 +164,10 @@ def main():
 
                 plan_file = f"{args.plan_file}.{plans_found}"
                 logging.info(f"Writing intermediate plan to {tc.colored(plan_file, 'blue')} ...")
-                plan = "\n".join([f"({transition.name})" for transition in solution.transitions])
-                with open(plan_file, "w") as f:
-                    f.write(plan)
-                    plans_found += 1
+                # encode once, the same buffer is reused for the final plan file
+                plan = "\n".join([f"({transition.name})" for transition in solution.transitions]).encode()
+                write_plan(plan_file, plan)
+                plans_found += 1
 
                 logging.info("Continuing search...")
             elif solution.time_out:
@@ -140,15 +181,14 @@ def main():
                 break
 
         if solution is not None and not solution.time_out:
-            logging.info(tc.colored(f"Search completed in {timer.get_time()}s", "green"))
+            logging.info(tc.colored(f"Search completed in {timer.get_time():.4f}s", "green"))
 
     if plans_found == 0:
         logging.info("No plan found!")
     else:
         plan_file = args.plan_file
         logging.info(f"Writing final plan to {tc.colored(plan_file, 'blue')} ...")
-        with open(plan_file, "w") as f:
-            f.write(plan)
+        write_plan(plan_file, plan)
 
         if args.validate:
             output = subprocess.run(["which", "validate"], capture_output=True, text=True, check=False).stdout
@@ -4,34 +4,65 @@ Author: Dillon Z. Chen
 Year: 2025
 """
 
+import hashlib
+import logging
+from collections import deque
 from dataclasses import dataclass
+from sys import intern
+from typing import Iterator
 
 import didppy as dp
 
 
-@dataclass
+@dataclass(slots=True)
 class Operator:
+    # preconditions and effects are stored as parallel (vars, vals) columns, trivial preconditions with val -1 are
+    # dropped while parsing
     name: str
-    preconditions: dict[int, int]
-    effects: dict[int, int]
+    pre_vars: tuple[int, ...]
+    pre_vals: tuple[int, ...]
+    eff_vars: tuple[int, ...]
+    eff_vals: tuple[int, ...]
     cost: float
 
 
-@dataclass
+@dataclass(slots=True)
 class Rule:
     preconditions: dict[int, int]
     var: int
     val: int
 
 
-@dataclass
+@dataclass(slots=True)
 class Variable:
     name: str
     values: list[str]
     axiom_layer: int
 
 
+def _source_fingerprint() -> str:
+    # identifies this version of the parser, so cached parses are invalidated whenever the parser changes
+    with open(__file__, "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+
+# attributes set by _parse that make up the parsed intermediate representation
+_PARSED_IR_FIELDS = (
+    "_detected_axioms",
+    "_detected_conditional_effects",
+    "_init",
+    "_goal",
+    "_variables",
+    "_rules",
+    "_operators",
+    "_axiom_heads",
+    "_axiom_edges",
+)
+
+
 class Sas2DypdlTransformer:
+    PARSER_FINGERPRINT = _source_fingerprint()
+
     def __init__(self, sas_content: str):
         self._detected_axioms = False
         self._detected_conditional_effects = False
@@ -39,6 +70,20 @@ class Sas2DypdlTransformer:
         self._model = dp.Model()
         self._parse(sas_content)
 
+    @classmethod
+    def from_parsed_ir(cls, ir: dict) -> "Sas2DypdlTransformer":
+        # reconstruct a transformer from the output of parsed_ir without reparsing the SAS+ content, the ir must come
+        # from the same PARSER_FINGERPRINT
+        transformer = cls.__new__(cls)
+        transformer._model = dp.Model()
+        for field in _PARSED_IR_FIELDS:
+            setattr(transformer, field, ir[field])
+        return transformer
+
+    @property
+    def parsed_ir(self) -> dict:
+        return {field: getattr(self, field) for field in _PARSED_IR_FIELDS}
+
     @property
     def detected_axioms(self) -> bool:
         return self._detected_axioms
@@ -47,8 +92,8 @@ class Sas2DypdlTransformer:
     def detected_conditional_effects(self) -> bool:
         return self._detected_conditional_effects
 
-    def _parse(self, sas_content) -> None:
-        self._init: dict[int, int] = {}
+    def _parse(self, sas_content: str) -> None:
+        self._init: list[int] = []  # indexed by var id
         self._goal: dict[int, int] = {}
         self._variables: dict[int, Variable] = {}
         self._rules: list[Rule] = []
@@ -58,22 +103,22 @@ class Sas2DypdlTransformer:
 
         line_iterator = iter(sas_content.splitlines())
 
-        def get_line():
-            try:
-                return next(line_iterator).replace("\n", "")
-            except StopIteration:
-                return None
-
-        while True:
-            line = get_line()
+        def get_line() -> str:
+            # only called inside a section, so running out of lines means the file was cut short
+            line = next(line_iterator, None)
             if line is None:
-                break
+                raise ValueError("truncated SAS+ file")
+            return line
+
+        for line in line_iterator:
             if line == "begin_variable":
-                var_name = get_line()
+                var_name = intern(get_line())
                 axiom_layer = int(get_line())
                 n_values = int(get_line())
                 var_values = [get_line() for _ in range(n_values)]
-                assert get_line() == "end_variable"
+                # read outside the assert so the sentinel is still consumed under python -O
+                end = get_line()
+                assert end == "end_variable"
                 i = len(self._variables)
                 assert f"var{i}" == var_name
                 self._variables[i] = Variable(
@@ -88,10 +133,11 @@ class Sas2DypdlTransformer:
                 n_preconditions = int(get_line())
                 preconditions = {}
                 for _ in range(n_preconditions):
-                    var_index, value = get_line().split()
-                    value = int(value)
-                    assert var_index not in preconditions
-                    preconditions[int(var_index)] = value
+                    var, val = get_line().split()
+                    var = int(var)
+                    val = int(val)
+                    assert var not in preconditions
+                    preconditions[var] = val
                 toks = get_line().split()
                 assert len(toks) == 3
                 # the last row is (var, 1 - val, val)
@@ -104,7 +150,8 @@ class Sas2DypdlTransformer:
                 assert val == 0  # represents atom switching on, should never switch off
                 rule = Rule(preconditions=preconditions, var=var, val=val)
                 self._rules.append(rule)
-                assert get_line() == "end_rule"
+                end = get_line()
+                assert end == "end_rule"
                 if var not in self._axiom_heads:
                     self._axiom_heads[var] = []
                 self._axiom_heads[var].append(rule)
@@ -113,87 +160,130 @@ class Sas2DypdlTransformer:
                     self._axiom_edges[var] = set()
                 self._axiom_edges[var].update(preconditions.keys())
             elif line == "begin_operator":
-                op_name = get_line()
+                op_name = intern(get_line())
                 n_preconditions = int(get_line())
-                preconditions = {}
+                pre_vars = []
+                pre_vals = []
                 for _ in range(n_preconditions):
                     var, val = get_line().split()
-                    var = int(var)
-                    val = int(val)
-                    assert var not in preconditions
-                    preconditions[var] = val
+                    pre_vars.append(int(var))
+                    pre_vals.append(int(val))
                 n_effects = int(get_line())
-                effects = {}
+                eff_vars = []
+                eff_vals = []
                 for _ in range(n_effects):
+                    # each row is (n_cond, [cond_var, cond_val] * n_cond, var, pre, post)
                     toks = get_line().split()
-                    cond = int(toks[0])
-                    var = int(toks[1])
-                    pre = int(toks[2])
-                    post = int(toks[3])
-                    if cond != 0:
+                    if toks[0] != "0":
                         self._detected_conditional_effects = True
                         # raise NotImplementedError("Conditional effects are not yet supported.")
                         continue
-                    assert var not in preconditions
-                    assert var not in effects
-                    preconditions[var] = pre
-                    effects[var] = post
+                    var, pre, post = toks[-3:]
+                    var = int(var)
+                    pre = int(pre)
+                    if pre != -1:
+                        pre_vars.append(var)
+                        pre_vals.append(pre)
+                    eff_vars.append(var)
+                    eff_vals.append(int(post))
+                # prevail and effect variables are pairwise distinct, which also implies pre_vars has no duplicates
+                assert len(set(pre_vars[:n_preconditions]).union(eff_vars)) == n_preconditions + len(eff_vars)
                 cost = float(get_line())
                 assert int(round(cost)) == float(cost), "action costs must be int"
                 cost = int(round(cost))
-                self._operators.append(Operator(name=op_name, preconditions=preconditions, effects=effects, cost=cost))
-                assert get_line() == "end_operator"
+                operator = Operator(
+                    name=op_name,
+                    pre_vars=tuple(pre_vars),
+                    pre_vals=tuple(pre_vals),
+                    eff_vars=tuple(eff_vars),
+                    eff_vals=tuple(eff_vals),
+                    cost=cost,
+                )
+                self._operators.append(operator)
+                end = get_line()
+                assert end == "end_operator"
             elif line == "begin_goal":
                 n_goals = int(get_line())
                 for _ in range(n_goals):
-                    var, val = get_line().split()
-                    var = int(var)
-                    val = int(val)
+                    toks = get_line().split()
+                    if len(toks) != 2:
+                        raise ValueError(f"malformed SAS+ goal row: {' '.join(toks)}")
+                    var = int(toks[0])
+                    val = int(toks[1])
                     assert var not in self._goal
                     self._goal[var] = val
-                assert get_line() == "end_goal"
+                end = get_line()
+                assert end == "end_goal"
             elif line == "begin_state":
-                for var in range(len(self._variables)):
-                    val = int(get_line())
-                    self._init[var] = val
-                assert get_line() == "end_state"
-
-    def _handle_variables(self) -> None:
-        self._didp_variables = {}
-
+                for _ in range(len(self._variables)):
+                    toks = get_line().split()
+                    if len(toks) != 1:
+                        raise ValueError(f"malformed SAS+ state row: {' '.join(toks)}")
+                    self._init.append(int(toks[0]))
+                end = get_line()
+                assert end == "end_state"
+
+        self._remove_duplicate_operators()
+
+    def _remove_duplicate_operators(self) -> None:
+        # operators with the same preconditions, effects and cost induce identical transitions, keep the first name;
+        # the translator emits prevail and effect rows sorted by var so the columns themselves are a canonical key
+        seen = set()
+        operators = []
+        for op in self._operators:
+            key = (op.pre_vars, op.pre_vals, op.eff_vars, op.eff_vals, op.cost)
+            if key in seen:
+                continue
+            seen.add(key)
+            operators.append(op)
+        n_removed = len(self._operators) - len(operators)
+        if n_removed > 0:
+            logging.info(f"Removed {n_removed} duplicate operators")
+        self._operators = operators
+
+    def _handle_axiom_mask(self) -> None:
+        # axiom_mask[var] is True iff var is a derived variable, indexed by var id for cheap membership probes
+        self._axiom_mask = [False] * len(self._variables)
+        for head in self._axiom_heads:
+            self._axiom_mask[head] = True
+
+    def _iter_variables(self) -> Iterator[tuple[int, dp.IntVar]]:
         """state vars"""
+        axiom_mask = self._axiom_mask
+        add_int_var = self._model.add_int_var
         for i, variable in self._variables.items():
-            if i in self._axiom_heads:
+            if axiom_mask[i]:
                 continue
-            var = self._model.add_int_var(name=variable.name, target=self._init[i])
-            self._didp_variables[i] = var
+            yield i, add_int_var(name=variable.name, target=self._init[i])
 
     def _handle_axioms(self) -> None:
-        var = next(iter(self._didp_variables.values()))
+        axiom_mask = self._axiom_mask
+        var = next(v for v in self._didp_variables if v is not None)
         TRUE = var == var
         FALSE = var != var
-        # value iteration to stratify, does not terminate if cycles exist
-        # TODO throw an error if there is a cycle in the axiom graph
-        # call --layer-strategy max in the downward translator or manually detect cycles
-        cur_V = {i: None for i in self._axiom_edges}
-        new_V = {i: 0 for i in self._axiom_edges}
-
-        def is_diff():
-            for i in cur_V:
-                if new_V[i] != cur_V[i]:
-                    return True
-            return False
-
-        while is_diff():
-            cur_V = new_V.copy()
-            for head, body in self._axiom_edges.items():
-                update = 1
-                for i in body:
-                    if i in cur_V:
-                        update = max(update, cur_V[i] + 1)
-                new_V[head] = update
-
-        assert new_V.keys() == self._axiom_edges.keys()
+        # stratify with a topological sort over axiom heads; a body variable that is itself an axiom head must be
+        # evaluated in an earlier layer than the heads depending on it
+        successors = {head: [] for head in self._axiom_edges}
+        indegree = {head: 0 for head in self._axiom_edges}
+        for head, body in self._axiom_edges.items():
+            for i in body:
+                if i in successors:
+                    successors[i].append(head)
+                    indegree[head] += 1
+
+        new_V = {}
+        queue = deque(head for head, degree in indegree.items() if degree == 0)
+        while queue:
+            head = queue.popleft()
+            new_V[head] = max((new_V[i] + 1 for i in self._axiom_edges[head] if i in new_V), default=1)
+            for succ in successors[head]:
+                indegree[succ] -= 1
+                if indegree[succ] == 0:
+                    queue.append(succ)
+
+        if new_V.keys() != self._axiom_edges.keys():
+            # call --layer-strategy max in the downward translator to avoid this
+            raise ValueError("Cycle detected in the axiom graph.")
 
         min_val = float("inf")
         max_val = float("-inf")
@@ -220,7 +310,7 @@ class Sas2DypdlTransformer:
                         for var, val in rule.preconditions.items():
 
                             def get_atom():
-                                if var not in self._axiom_heads:
+                                if not axiom_mask[var]:
                                     ret = self._didp_variables[var] == val
                                 elif val == 0:
                                     # if 0 in sas, it means turned on
@@ -248,33 +338,31 @@ class Sas2DypdlTransformer:
                     self._didp_variables[head] = self._model.add_bool_state_fun(trigger)
 
     def _handle_operators(self) -> None:
-        didp_actions = {}
+        axiom_mask = self._axiom_mask
+        didp_variables = self._didp_variables
+        add_transition = self._model.add_transition
+        state_cost = dp.IntExpr.state_cost()
         for op in self._operators:
-            preconditions = []
-            for var, val in op.preconditions.items():
-                if val == -1:
-                    continue
-                if var not in self._axiom_heads:
-                    preconditions.append(self._didp_variables[var] == val)
-                else:
-                    preconditions.append(self._didp_variables[var])
+            preconditions = [
+                didp_variables[var] if axiom_mask[var] else didp_variables[var] == val
+                for var, val in zip(op.pre_vars, op.pre_vals)
+            ]
             effects = []
-            for var, val in op.effects.items():
-                assert var not in self._axiom_heads
-                effects.append((self._didp_variables[var], val))
+            for var, val in zip(op.eff_vars, op.eff_vals):
+                assert not axiom_mask[var]
+                effects.append((didp_variables[var], val))
             didp_action = dp.Transition(
                 name=op.name,
-                cost=op.cost + dp.IntExpr.state_cost(),
+                cost=op.cost + state_cost,
                 preconditions=preconditions,
                 effects=effects,
             )
-            didp_actions[op.name] = didp_action
-            self._model.add_transition(didp_action)
+            add_transition(didp_action)
 
     def _handle_goal(self) -> None:
         base_case = []
         for var, val in self._goal.items():
-            if var in self._axiom_heads:
+            if self._axiom_mask[var]:
                 if val == 1:
                     base_case.append(self._didp_variables[var])
                 else:
@@ -288,7 +376,11 @@ class Sas2DypdlTransformer:
         if self.detected_axioms or self.detected_conditional_effects:
             raise NotImplementedError("Axioms and conditional effects are not yet supported.")
 
-        self._handle_variables()
+        self._handle_axiom_mask()
+        # indexed by var id, derived variables stay None until _handle_axioms fills them in
+        self._didp_variables = [None] * len(self._variables)
+        for i, var in self._iter_variables():
+            self._didp_variables[i] = var
         self._handle_operators()
         self._handle_goal()
         return self._model
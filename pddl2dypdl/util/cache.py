@@ -0,0 +1,42 @@
+import hashlib
+import logging
+import os
+import pickle
+from typing import Any, Optional
+
+
+CACHE_ENV_VAR = "PDDL2DYPDL_CACHE"
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "pddl2dypdl")
+
+
+def cache_enabled() -> bool:
+    return os.environ.get(CACHE_ENV_VAR, "0") == "1"
+
+
+def _cache_path(content: str, fingerprint: str) -> str:
+    # the fingerprint of the code producing the cached object is part of the key, so entries from other versions miss
+    hasher = hashlib.blake2b(fingerprint.encode(), digest_size=16)
+    hasher.update(content.encode())
+    return os.path.join(CACHE_DIR, f"{hasher.hexdigest()}.pkl")
+
+
+def load_cache(content: str, fingerprint: str) -> Optional[Any]:
+    path = _cache_path(content, fingerprint)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return pickle.load(f)
+    except Exception as e:
+        logging.warning(f"Ignoring unreadable cache file {path}: {e}")
+        return None
+
+
+def save_cache(content: str, fingerprint: str, obj: Any) -> None:
+    path = _cache_path(content, fingerprint)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # write to a temporary file first so concurrent runs never read a partially written cache
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
@@ -36,18 +36,17 @@ class TimerContextManager:
     def __enter__(self):
         msg = tc.colored(f"Started {self.description}...", "magenta")
         self.log(msg)
-        self.start_time = time.time()
+        self.start_ns = time.perf_counter_ns()
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
         if traceback is not None:
             return
-        end_time = time.time()
-        execution_time = end_time - self.start_time
+        execution_ns = time.perf_counter_ns() - self.start_ns
         if not self.description or not self.end:
             return
-        msg = tc.colored(f"Finished {self.description} in {execution_time}s", "green")
+        msg = tc.colored(f"Finished {self.description} in {execution_ns / 1e9:.4f}s", "green")
         self.log(msg)
 
-    def get_time(self):
-        return time.time() - self.start_time
+    def get_time(self) -> float:
+        return (time.perf_counter_ns() - self.start_ns) / 1e9
@@ -0,0 +1,63 @@
+import logging
+import pickle
+
+import pytest
+
+from pddl2dypdl.__main__ import main
+from pddl2dypdl.sas2dypdl import Sas2DypdlTransformer
+from pddl2dypdl.util import cache
+from tests.fixtures import BLOCKS_PDDL
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv(cache.CACHE_ENV_VAR, "1")
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+def test_cache_hit(cache_dir, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    domain_pddl, problem_pddl = BLOCKS_PDDL[0]
+    argv = [domain_pddl, problem_pddl, "--plan-file", str(tmp_path / "sas_plan")]
+
+    main(argv)
+    assert "Loaded parsed SAS+ from cache" not in caplog.text
+    assert "Plan found!" in caplog.text
+    assert len(list(cache_dir.iterdir())) == 1
+
+    caplog.clear()
+    main(argv)
+    assert "Loaded parsed SAS+ from cache" in caplog.text
+    assert "Plan found!" in caplog.text
+
+
+def test_cache_ignores_invalid_entry(cache_dir, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    domain_pddl, problem_pddl = BLOCKS_PDDL[0]
+    argv = [domain_pddl, problem_pddl, "--plan-file", str(tmp_path / "sas_plan")]
+
+    main(argv)
+    (cache_file,) = cache_dir.iterdir()
+    with open(cache_file, "wb") as f:
+        pickle.dump(["not", "a", "dict"], f)
+
+    caplog.clear()
+    main(argv)
+    assert "Loaded parsed SAS+ from cache" not in caplog.text
+    assert "Plan found!" in caplog.text
+
+
+def test_cache_misses_after_parser_change(cache_dir, tmp_path, caplog, monkeypatch):
+    caplog.set_level(logging.INFO)
+    domain_pddl, problem_pddl = BLOCKS_PDDL[0]
+    argv = [domain_pddl, problem_pddl, "--plan-file", str(tmp_path / "sas_plan")]
+
+    main(argv)
+    monkeypatch.setattr(Sas2DypdlTransformer, "PARSER_FINGERPRINT", "changed parser")
+
+    caplog.clear()
+    main(argv)
+    assert "Loaded parsed SAS+ from cache" not in caplog.text
+    assert "Plan found!" in caplog.text
+    assert len(list(cache_dir.iterdir())) == 2
@@ -1,13 +1,13 @@
-import subprocess
+import logging
 
 import pytest
 
+from pddl2dypdl.__main__ import main
 from tests.fixtures import BLOCKS_PDDL
 
 
 @pytest.mark.parametrize("domain_pddl, problem_pddl", BLOCKS_PDDL)
-def test_pddl(domain_pddl: str, problem_pddl: str):
-    command = ["python3", "-m", "pddl2dypdl", domain_pddl, problem_pddl]
-    result = subprocess.run(command, capture_output=True, text=True)
-    assert result.returncode == 0, f"Command failed with error: {result.stderr}"
-    assert "Plan found!" in result.stdout, "Expected success message not found in output."
+def test_pddl(domain_pddl: str, problem_pddl: str, tmp_path, caplog):
+    caplog.set_level(logging.INFO)
+    main([domain_pddl, problem_pddl, "--plan-file", str(tmp_path / "sas_plan")])
+    assert "Plan found!" in caplog.text, "Expected success message not found in output."
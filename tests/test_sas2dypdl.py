@@ -0,0 +1,162 @@
+import pytest
+
+from pddl2dypdl.sas2dypdl import Sas2DypdlTransformer
+
+
+_TASK_HEADER = """begin_version
+3
+end_version
+begin_metric
+0
+end_metric
+2
+begin_variable
+var0
+-1
+2
+Atom on(a)
+NegatedAtom on(a)
+end_variable
+begin_variable
+var1
+-1
+2
+Atom clear(a)
+NegatedAtom clear(a)
+end_variable
+0
+begin_state
+0
+0
+end_state
+begin_goal
+1
+0 1
+end_goal
+"""
+
+
+def _operator(name: str, effect: str = "0 0 0 1") -> str:
+    return f"""begin_operator
+{name}
+1
+1 0
+1
+{effect}
+1
+end_operator
+"""
+
+
+def _task(operators: list[str]) -> str:
+    return _TASK_HEADER + f"{len(operators)}\n" + "".join(operators) + "0\n"
+
+
+def test_duplicate_operators_are_removed():
+    operators = [_operator("push a"), _operator("shove a"), _operator("pull a", effect="0 0 1 0")]
+    transformer = Sas2DypdlTransformer(_task(operators))
+    assert [op.name for op in transformer._operators] == ["push a", "pull a"]
+    transformer.transform()
+
+
+@pytest.mark.parametrize("last_line", ["begin_operator", "shove a", "0 0 0 1", "begin_state", "Atom on(a)", "var1"])
+def test_truncated_file_raises(last_line: str):
+    task = _task([_operator("push a"), _operator("shove a")])
+    truncated = task[: task.index(f"{last_line}\n") + len(last_line)]
+    with pytest.raises(ValueError, match="truncated SAS\\+ file"):
+        Sas2DypdlTransformer(truncated)
+
+
+@pytest.mark.parametrize(
+    "section, row, malformed_row",
+    [
+        ("begin_goal", "0 1", "0 1 0"),
+        ("begin_state", "0", "0 1"),
+    ],
+)
+def test_malformed_row_raises(section: str, row: str, malformed_row: str):
+    task = _task([_operator("push a")])
+    start = task.index(section)
+    i = task.index(f"\n{row}\n", start) + 1
+    malformed = task[:i] + malformed_row + task[i + len(row) :]
+    with pytest.raises(ValueError, match="malformed SAS\\+"):
+        Sas2DypdlTransformer(malformed)
+
+
+_AXIOM_TASK_HEADER = """begin_version
+3
+end_version
+begin_metric
+0
+end_metric
+3
+begin_variable
+var0
+-1
+2
+Atom p()
+NegatedAtom p()
+end_variable
+begin_variable
+var1
+1
+2
+Atom d1()
+NegatedAtom d1()
+end_variable
+begin_variable
+var2
+0
+2
+Atom d2()
+NegatedAtom d2()
+end_variable
+0
+begin_state
+0
+1
+1
+end_state
+begin_goal
+1
+1 0
+end_goal
+0
+"""
+
+
+def _rule(body: str, head: int) -> str:
+    return f"""begin_rule
+{len(body.splitlines())}
+{body}
+{head} 1 0
+end_rule
+"""
+
+
+def _handle_axioms(sas_content: str) -> Sas2DypdlTransformer:
+    transformer = Sas2DypdlTransformer(sas_content)
+    transformer._handle_axiom_mask()
+    transformer._didp_variables = [None] * len(transformer._variables)
+    for i, var in transformer._iter_variables():
+        transformer._didp_variables[i] = var
+    transformer._handle_axioms()
+    return transformer
+
+
+@pytest.mark.parametrize("p, derived", [(0, True), (1, False)])
+def test_axiom_layers(p: int, derived: bool):
+    # d1 <- d2 <- p, listed so that d1 must be evaluated after d2 despite its lower var id
+    rules = [_rule("2 0", head=1), _rule("0 0", head=2)]
+    task = _AXIOM_TASK_HEADER.replace("begin_state\n0\n", f"begin_state\n{p}\n")
+    transformer = _handle_axioms(task + f"{len(rules)}\n" + "".join(rules))
+    model = transformer._model
+    state = model.target_state
+    assert transformer._didp_variables[2].eval(state, model) == derived
+    assert transformer._didp_variables[1].eval(state, model) == derived
+
+
+def test_axiom_cycle_raises():
+    rules = [_rule("1 0", head=1), _rule("0 0", head=2)]
+    with pytest.raises(ValueError, match="Cycle detected in the axiom graph"):
+        _handle_axioms(_AXIOM_TASK_HEADER + f"{len(rules)}\n" + "".join(rules))